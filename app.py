@@ -1,49 +1,119 @@
-# Import necessary libraries
 import os
+
+# gevent must monkey-patch the stdlib before anything else imports it, so
+# this block stays at the very top. Only the gunicorn web workers set
+# GEVENT_PATCH=1 (see README); the Celery worker and the setup/seed
+# scripts import this module too, and patching a prefork worker is
+# unsupported. psycopg2 additionally needs psycogreen to cooperate with
+# the event loop.
+if os.environ.get('GEVENT_PATCH') == '1':
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+# Import necessary libraries
+import atexit
+import hashlib
+import hmac
 import secrets
 import smtplib
+import string
+import threading
 from email.message import EmailMessage
-import json
+import orjson
 from datetime import datetime, date, timedelta, timezone, time
-from dotenv import load_dotenv, find_dotenv
+from dotenv import load_dotenv
 from flask import (Flask, render_template, request, redirect, url_for,
-                   flash, session, Response)
+                   flash, session, Response, stream_with_context, g, abort)
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import (LoginManager, UserMixin, login_user, logout_user,
                          login_required, current_user)
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_wtf.csrf import CSRFProtect
+from flask_caching import Cache
+from flask_session import Session
+import redis
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from celery import Celery
+from celery.schedules import crontab
 import uuid
-from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
-from sqlalchemy.orm import relationship
-import io
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP, insert as pg_insert
+from sqlalchemy.orm import relationship, selectinload
+import tempfile
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
-from sqlalchemy import func
+from sqlalchemy import func, select, text
 import pytz
 
-load_dotenv(find_dotenv(), override=True)
+# Containerized deploys inject real env vars, so only read a .env file
+# when the core config is absent — find_dotenv()'s upward directory walk
+# is wasted syscalls on every cold start otherwise.
+if not os.getenv('DATABASE_URL'):
+    load_dotenv(os.getenv('DOTENV_PATH', '.env'), override=True)
 
 # App Initialization
+class ORJSONProvider(DefaultJSONProvider):
+    """orjson-backed provider so jsonify and |tojson use the fast path."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # --- Configuration ---
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'a-default-secret-key-for-dev')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['ADMIN_PASSWORD'] = os.getenv('ADMIN_PASSWORD')
+# Only the SHA-256 of the admin password is kept in config; None when unset
+# so a missing env var can never match anything.
+_admin_password = os.getenv('ADMIN_PASSWORD')
+app.config['ADMIN_PASSWORD_HASH'] = (
+    hashlib.sha256(_admin_password.encode()).hexdigest() if _admin_password else None
+)
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True, 'pool_recycle': 300, 'pool_timeout': 20, 'max_overflow': 0
+    'pool_pre_ping': True, 'pool_recycle': 300,
+    # Fail fast instead of queueing 20s when the pool is saturated, and
+    # allow bursts to overflow rather than serializing traffic
+    'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 5,
+    # LIFO keeps the most recently used connection warm
+    'pool_use_lifo': True,
+    'query_cache_size': 1200
 }
 app.config['SMTP_SERVER'] = os.getenv('SMTP_SERVER')
 app.config['SMTP_PORT'] = int(os.getenv('SMTP_PORT', 587))
 app.config['SMTP_USERNAME'] = os.getenv('SMTP_USERNAME')
 app.config['SMTP_PASSWORD'] = os.getenv('SMTP_PASSWORD')
 app.config['MAIL_SENDER'] = os.getenv('MAIL_SENDER', 'noreply@jitsports.com')
+app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+if os.getenv('REDIS_URL'):
+    app.config['CACHE_TYPE'] = 'RedisCache'
+    app.config['CACHE_REDIS_URL'] = os.getenv('REDIS_URL')
+else:
+    # Per-process in-memory cache for local development without Redis
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+if os.getenv('REDIS_URL'):
+    # Server-side sessions: the cookie carries only an id, and session
+    # state is shared across workers
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = redis.Redis.from_url(os.getenv('REDIS_URL'))
 
 # --- Extensions Initialization ---
+celery = Celery('sports', broker=app.config['REDIS_URL'])
+if app.config.get('SESSION_TYPE'):
+    Session(app)
 csrf = CSRFProtect(app)
+cache = Cache(app)
+limiter = Limiter(
+    get_remote_address,
+    app=app,
+    storage_uri=app.config['REDIS_URL'] if os.getenv('REDIS_URL') else 'memory://',
+)
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
@@ -55,8 +125,6 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String, unique=True, nullable=False)
     role = db.Column(db.String, nullable=False, default='student')
     profile_picture = db.Column(db.String)
-    otp_hash = db.Column(db.String)
-    otp_expiry = db.Column(TIMESTAMP(timezone=True))
     bookings = relationship("Booking", back_populates="user", cascade="all, delete-orphan")
     
     # --- NEW COLUMN ---
@@ -73,6 +141,16 @@ class Game(db.Model):
 
 class Booking(db.Model):
     __tablename__ = 'booking'
+    __table_args__ = (
+        db.Index('ix_booking_game_time', 'game_id', 'booking_time'),
+        db.Index('ix_booking_time_status', 'booking_time', 'status'),
+        db.Index('ix_booking_user_status', 'user_id', 'status'),
+        db.Index('ix_booking_user_time', 'user_id', 'booking_time'),
+        # Partial unique index: only Confirmed rows contend for a slot, so
+        # a cancelled booking leaves the slot free to rebook
+        db.Index('uq_booking_slot', 'game_id', 'booking_time', unique=True,
+                 postgresql_where=text("status = 'Confirmed'")),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('profiles.id'), nullable=False)
     game_id = db.Column(db.Integer, db.ForeignKey('games.id'), nullable=False)
@@ -82,62 +160,188 @@ class Booking(db.Model):
     user = relationship("User", back_populates="bookings")
     game = relationship("Game", back_populates="bookings")
 
+# Dedicated OTP signing key, so rotating the session secret does not void
+# in-flight OTPs (and vice versa); falls back to the Flask secret when the
+# env var is unset so existing deployments keep working.
+_OTP_KEY = (os.getenv('OTP_HMAC_KEY') or app.config['SECRET_KEY']).encode()
+
+def hash_otp(otp):
+    """HMAC a short-lived OTP. PBKDF2 (~100ms of CPU per call) is overkill
+    for a random 6-hex-char code that expires in 5 minutes."""
+    return hmac.new(_OTP_KEY, otp.encode(), 'sha256').hexdigest()
+
 @login_manager.user_loader
 def load_user(user_id):
     try:
-        return User.query.get(uuid.UUID(user_id))
+        uid = uuid.UUID(user_id)
     except (ValueError, TypeError):
         return None
+    # Memoized per request so repeated loads don't re-query
+    users = g.setdefault('_request_users', {})
+    if uid not in users:
+        users[uid] = User.query.get(uid)
+    return users[uid]
+
+# Games change rarely, so the catalog is served from the shared cache.
+# Any future admin write path must bust all of:
+#   cache.delete('games:all'); cache.delete('games:count')
+#   cache.delete_memoized(get_game)
+@cache.cached(timeout=3600, key_prefix='games:all')
+def all_games():
+    return Game.query.order_by(Game.name).all()
+
+@cache.cached(timeout=3600, key_prefix='games:count')
+def games_count():
+    return Game.query.count()
+
+# Site-wide, so safe to serve ~30s stale; a fresh booking busts it early
+# (cache.delete('stats:today')) so the dashboard never looks frozen.
+@cache.cached(timeout=30, key_prefix='stats:today')
+def today_confirmed_count():
+    today_start = IST_TZ.localize(datetime.combine(date.today(), time.min)).astimezone(timezone.utc)
+    today_end = today_start + timedelta(days=1)
+    return Booking.query.filter(
+        Booking.booking_time >= today_start,
+        Booking.booking_time < today_end,
+        Booking.status == 'Confirmed'
+    ).count()
 
-# --- Helper Functions ---
-def send_otp_email(recipient_email, otp):
-    # (Your existing code for sending OTP emails)
-    msg = EmailMessage()
-    msg.set_content(f"Your One-Time Password (OTP) is: {otp}\nThis code will expire in 5 minutes.")
-    msg['Subject'] = 'Your Sports Room Login OTP'
-    msg['From'] = app.config['MAIL_SENDER']
-    msg['To'] = recipient_email
-    try:
-        server = smtplib.SMTP(app.config['SMTP_SERVER'], app.config['SMTP_PORT'])
-        server.starttls()
-        server.login(app.config['SMTP_USERNAME'], app.config['SMTP_PASSWORD'])
-        server.send_message(msg)
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"--- SMTP ERROR: {e} ---")
-        return False
+@cache.memoize(timeout=3600)
+def get_game(game_id):
+    """Lightweight cached view of one Game; None when the id is unknown.
 
-def send_booking_confirmation_email(recipient_email, game_name, booking_dt):
-    # (Your existing code for sending booking confirmations)
-    ist_tz = pytz.timezone('Asia/Kolkata')
-    booking_dt_ist = booking_dt.astimezone(ist_tz)
-    date_str = booking_dt_ist.strftime('%A, %B %d, %Y')
-    time_str = booking_dt_ist.strftime('%I:%M %p')
-    msg = EmailMessage()
-    msg.set_content(f"""Hi {recipient_email.split('@')[0]},
+    A plain dict rather than a detached ORM instance so it is cheap to
+    pickle into Redis and safe to share between workers.
+    """
+    game = db.session.get(Game, game_id)
+    if game is None:
+        return None
+    return {
+        'id': game.id,
+        'name': game.name,
+        'max_players': game.max_players,
+        'duration_minutes': game.duration_minutes,
+        'image_filename': game.image_filename,
+    }
 
-Your booking for {game_name} is confirmed!
+def user_has_booking(user_id):
+    """EXISTS probe — the server returns a bare boolean, no row fetched."""
+    return db.session.query(
+        Booking.query.filter_by(user_id=user_id).exists()
+    ).scalar()
+
+# Bookings are stored in UTC and displayed in IST; the tz lookup walks
+# pytz's zone table, so resolve it once at import.
+IST_TZ = pytz.timezone('Asia/Kolkata')
+
+# Slots reserved for first-time users, keyed by weekday (Monday=0).
+# Module-level tuples so the booking POST path does a dict lookup instead
+# of rebuilding a list of fresh time() objects on every request.
+PRIORITY_SLOTS_BY_WEEKDAY = {
+    2: (time(16, 0),),
+    4: (time(15, 0), time(16, 30)),
+}
 
-Date: {date_str}
-Time: {time_str}
+# --- SMTP Connection Reuse ---
+# The TLS + AUTH handshake dominates the cost of a send, so each worker
+# keeps a persistent SMTP session and reuses it across emails. Connections
+# are held per thread: smtplib sessions are not thread-safe, and both
+# threaded gunicorn workers and the Celery prefork pool may send from
+# several threads at once.
+class MailClient:
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = smtplib.SMTP(app.config['SMTP_SERVER'], app.config['SMTP_PORT'])
+        conn.starttls()
+        conn.login(app.config['SMTP_USERNAME'], app.config['SMTP_PASSWORD'])
+        self._local.conn = conn
+        return conn
+
+    def send(self, msg):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.noop()
+            except (smtplib.SMTPServerDisconnected, OSError):
+                conn = None
+        if conn is None:
+            conn = self._connect()
+        conn.send_message(msg)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.quit()
+            except (smtplib.SMTPServerDisconnected, OSError):
+                pass
+            self._local.conn = None
+
+mail_client = MailClient()
+
+@atexit.register
+def _close_smtp():
+    mail_client.close()
+
+# Email bodies precompiled at import; sends only substitute values.
+_OTP_TMPL = string.Template(
+    "Your One-Time Password (OTP) is: $otp\nThis code will expire in 5 minutes."
+)
+_BOOKING_TMPL = string.Template("""Hi $user,
+
+Your booking for $game is confirmed!
+
+Date: $date
+Time: $time
 
 We look forward to seeing you.
 Thanks,
 The Sports Room Team""")
+_CANCELLATION_TMPL = string.Template("""Hi everyone,
+
+A booking for $game has been cancelled and is now available.
+
+Game: $game
+Date: $date
+Time: $time
+
+You can book this slot now via the app.
+
+Thanks,
+The Sports Room Team""")
+
+# --- Background Email Tasks ---
+# SMTP is slow (TLS handshake + AUTH + DATA), so emails are delivered by a
+# Celery worker instead of blocking the request thread. Run alongside gunicorn:
+#   celery -A app.celery worker
+@celery.task(autoretry_for=(smtplib.SMTPException, OSError), retry_backoff=True, max_retries=3)
+def send_otp_task(recipient_email, otp):
+    msg = EmailMessage()
+    msg.set_content(_OTP_TMPL.substitute(otp=otp))
+    msg['Subject'] = 'Your Sports Room Login OTP'
+    msg['From'] = app.config['MAIL_SENDER']
+    msg['To'] = recipient_email
+    # Let SMTP errors propagate so autoretry re-queues the delivery
+    mail_client.send(msg)
+
+@celery.task(autoretry_for=(smtplib.SMTPException, OSError), retry_backoff=True, max_retries=3)
+def send_booking_confirmation_task(recipient_email, game_name, booking_dt_iso):
+    # booking_dt travels as an ISO string so the task args stay JSON-safe
+    booking_dt = datetime.fromisoformat(booking_dt_iso)
+    booking_dt_ist = booking_dt.astimezone(IST_TZ)
+    date_str = booking_dt_ist.strftime('%A, %B %d, %Y')
+    time_str = booking_dt_ist.strftime('%I:%M %p')
+    msg = EmailMessage()
+    msg.set_content(_BOOKING_TMPL.substitute(
+        user=recipient_email.split('@')[0], game=game_name,
+        date=date_str, time=time_str))
     msg['Subject'] = f'Booking Confirmation for {game_name}'
     msg['From'] = app.config['MAIL_SENDER']
     msg['To'] = recipient_email
-    try:
-        server = smtplib.SMTP(app.config['SMTP_SERVER'], app.config['SMTP_PORT'])
-        server.starttls()
-        server.login(app.config['SMTP_USERNAME'], app.config['SMTP_PASSWORD'])
-        server.send_message(msg)
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"--- SMTP Booking Confirmation ERROR: {e} ---")
-        return False
+    # Let SMTP errors propagate so autoretry re-queues the delivery
+    mail_client.send(msg)
 
 # --- NEW HELPER FUNCTION ---
 def send_cancellation_notification_email(recipient_list, game_name, booking_dt):
@@ -147,24 +351,13 @@ def send_cancellation_notification_email(recipient_list, game_name, booking_dt):
     if not recipient_list:
         return False
 
-    ist_tz = pytz.timezone('Asia/Kolkata')
-    booking_dt_ist = booking_dt.astimezone(ist_tz)
+    booking_dt_ist = booking_dt.astimezone(IST_TZ)
     date_str = booking_dt_ist.strftime('%A, %B %d, %Y')
     time_str = booking_dt_ist.strftime('%I:%M %p')
     
     msg = EmailMessage()
-    msg.set_content(f"""Hi everyone,
-
-A booking for {game_name} has been cancelled and is now available.
-
-Game: {game_name}
-Date: {date_str}
-Time: {time_str}
-
-You can book this slot now via the app.
-
-Thanks,
-The Sports Room Team""")
+    msg.set_content(_CANCELLATION_TMPL.substitute(
+        game=game_name, date=date_str, time=time_str))
     msg['Subject'] = f'Slot Available: {game_name} on {date_str}'
     msg['From'] = app.config['MAIL_SENDER']
     # Send 'To' the sender itself; the magic happens in Bcc
@@ -172,20 +365,58 @@ The Sports Room Team""")
     msg['Bcc'] = ', '.join(recipient_list)
 
     try:
-        server = smtplib.SMTP(app.config['SMTP_SERVER'], app.config['SMTP_PORT'])
-        server.starttls()
-        server.login(app.config['SMTP_USERNAME'], app.config['SMTP_PASSWORD'])
-        server.send_message(msg)
-        server.quit()
+        mail_client.send(msg)
         return True
     except Exception as e:
         print(f"--- SMTP Cancellation Notification ERROR: {e} ---")
         return False
 
+def conditional_response(etag, render):
+    """Answer 304 when the client's ETag still matches, else render and tag.
+
+    Flashed messages are only delivered through a full render, so the
+    shortcut is skipped while any are queued.
+    """
+    if '_flashes' not in session and request.if_none_match.contains(etag):
+        # RFC 7232: a 304 carries the same validator/caching headers the
+        # 200 would have, so intermediaries can refresh stored copies.
+        not_modified = Response(status=304)
+        not_modified.set_etag(etag)
+        not_modified.cache_control.private = True
+        return not_modified
+    response = app.make_response(render())
+    response.set_etag(etag)
+    response.cache_control.private = True
+    return response
+
+@celery.task
+def rebuild_future_booking_index():
+    """Recreate ix_booking_future with a fresh cutoff.
+
+    Postgres requires index predicates to be immutable, so the partial
+    index carries a literal timestamp that goes stale as days pass; this
+    task slides it forward so the index keeps covering only recent and
+    future rows.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_booking_future"))
+        conn.execute(text(
+            "CREATE INDEX ix_booking_future ON booking (game_id, booking_time) "
+            f"WHERE booking_time >= '{cutoff}'"
+        ))
+
+celery.conf.beat_schedule = {
+    'rebuild-future-booking-index': {
+        'task': 'app.rebuild_future_booking_index',
+        'schedule': crontab(hour=0, minute=30),
+    },
+}
+
 # --- Context Processors ---
 @app.context_processor
 def inject_now():
-    return {'now_utc': datetime.now(timezone.utc), 'timezone': timezone, 'timedelta': timedelta}
+    return {'now_utc': datetime.now(timezone.utc), 'IST_TZ': IST_TZ}
 
 # --- Main Routes ---
 @app.route('/')
@@ -197,14 +428,28 @@ def landing():
 @app.route('/home')
 @login_required
 def home():
-    games = Game.query.order_by(Game.name).all()
-    stats = {
-        'total_games': Game.query.count(),
-        'user_bookings': Booking.query.filter_by(user_id=current_user.id, status='Confirmed').count(),
-        'today_bookings': Booking.query.filter(
-            func.date(Booking.booking_time) == date.today(), 
+    # Fingerprint only what the page actually shows, from cheap parts:
+    # the per-user count is one index-backed query, the site-wide
+    # numbers come from the shared cache. No table-wide aggregates on
+    # this route — it is the hottest in the app.
+    user_bookings = db.session.execute(
+        select(func.count()).select_from(Booking).where(
+            Booking.user_id == current_user.id,
             Booking.status == 'Confirmed'
-        ).count()
+        )
+    ).scalar()
+    etag = hashlib.md5(
+        f"home:{current_user.id}:{date.today()}:{games_count()}:"
+        f"{today_confirmed_count()}:{user_bookings}".encode()
+    ).hexdigest()
+    return conditional_response(etag, lambda: render_home(user_bookings))
+
+def render_home(user_bookings):
+    games = all_games()
+    stats = {
+        'user_bookings': user_bookings,
+        'today_bookings': today_confirmed_count(),
+        'total_games': games_count(),
     }
     return render_template('home.html', games=games, stats=stats)
 
@@ -212,9 +457,11 @@ def home():
 @app.route('/book/<int:game_id>', methods=['GET', 'POST'])
 @login_required
 def book_game(game_id):
-    game = Game.query.get_or_404(game_id)
-    ist_tz = pytz.timezone('Asia/Kolkata')
-    
+
+    game = get_game(game_id)
+    if game is None:
+        abort(404)
+
     if request.method == 'POST':
         booking_date_str = request.form.get('booking_date')
         booking_time_str = request.form.get('booking_time')
@@ -226,13 +473,14 @@ def book_game(game_id):
         selected_date = datetime.strptime(booking_date_str, '%Y-%m-%d').date()
         selected_time = datetime.strptime(booking_time_str, '%H:%M').time()
         
-        start_of_day_ist = ist_tz.localize(datetime.combine(selected_date, time.min))
-        end_of_day_ist = ist_tz.localize(datetime.combine(selected_date, time.max))
-        
+        # One localize + timedelta covers the IST day as a half-open range
+        day_start_utc = IST_TZ.localize(datetime.combine(selected_date, time.min)).astimezone(timezone.utc)
+        day_end_utc = day_start_utc + timedelta(days=1)
+
         todays_bookings_count = Booking.query.filter(
             Booking.user_id == current_user.id,
-            Booking.booking_time >= start_of_day_ist.astimezone(timezone.utc),
-            Booking.booking_time <= end_of_day_ist.astimezone(timezone.utc),
+            Booking.booking_time >= day_start_utc,
+            Booking.booking_time < day_end_utc,
             Booking.status == 'Confirmed'
         ).count()
         
@@ -240,49 +488,56 @@ def book_game(game_id):
             flash('You have already reached the maximum of two bookings for this day.', 'danger')
             return redirect(url_for('book_game', game_id=game_id))
 
-        is_new_user = Booking.query.filter_by(user_id=current_user.id).first() is None
-        priority_slots = [
-            (2, time(16, 0)),
-            (4, time(15, 0)),
-            (4, time(16, 30))
-        ]
-        
-        if not is_new_user and (selected_date.weekday(), selected_time) in priority_slots:
+        is_new_user = not user_has_booking(current_user.id)
+
+        if not is_new_user and selected_time in PRIORITY_SLOTS_BY_WEEKDAY.get(selected_date.weekday(), ()):
             flash('This slot is reserved for new users. Please choose another.', 'danger')
             return redirect(url_for('book_game', game_id=game_id))
 
         naive_dt = datetime.combine(selected_date, selected_time)
-        booking_dt_in_ist = ist_tz.localize(naive_dt)
+        booking_dt_in_ist = IST_TZ.localize(naive_dt)
         booking_dt_utc = booking_dt_in_ist.astimezone(timezone.utc)
         
         if booking_dt_utc < datetime.now(timezone.utc):
             flash('Cannot book a slot in the past.', 'danger')
             return redirect(url_for('book_game', game_id=game_id))
 
-        existing_booking = Booking.query.filter_by(game_id=game_id, booking_time=booking_dt_utc, status='Confirmed').first()
-        if existing_booking:
-            flash(f'{game.name} is already booked for this time. Please choose another slot.', 'danger')
+        # ON CONFLICT against the uq_booking_slot partial index claims the
+        # slot atomically: an empty RETURNING means someone else holds it.
+        result = db.session.execute(
+            pg_insert(Booking)
+            .values(user_id=current_user.id, game_id=game_id,
+                    booking_time=booking_dt_utc, status='Confirmed')
+            .on_conflict_do_nothing(
+                index_elements=['game_id', 'booking_time'],
+                index_where=text("status = 'Confirmed'"))
+            .returning(Booking.id)
+        )
+        booked_id = result.scalar()
+        db.session.commit()
+        if booked_id is None:
+            flash(f'{game["name"]} is already booked for this time. Please choose another slot.', 'danger')
             return redirect(url_for('book_game', game_id=game_id))
+        cache.delete('stats:today')
 
-        new_booking = Booking(user_id=current_user.id, game_id=game_id, booking_time=booking_dt_utc, status='Confirmed')
-        db.session.add(new_booking)
-        db.session.commit()
-        
-        send_booking_confirmation_email(current_user.username, game.name, booking_dt_utc)
-        flash(f'Successfully booked {game.name}! A confirmation has been sent to your email.', 'success')
+        send_booking_confirmation_task.delay(current_user.username, game['name'], booking_dt_utc.isoformat())
+        flash(f'Successfully booked {game["name"]}! A confirmation has been sent to your email.', 'success')
         
         return redirect(url_for('profile'))
 
-    is_new_user_check = Booking.query.filter_by(user_id=current_user.id).first() is None
+    # GET: the game came from cache, so only the slot times hit the DB.
+    # orjson serializes datetimes natively (RFC 3339), no isoformat() loop.
     now = datetime.now(timezone.utc)
-    existing_bookings_query = Booking.query.filter(
-        Booking.game_id == game_id, 
-        Booking.booking_time >= now,
-        Booking.status == 'Confirmed'
-    ).all()
-    booked_slots = [b.booking_time.isoformat() for b in existing_bookings_query]
-    
-    return render_template('book_game.html', game=game, booked_slots_json=json.dumps(booked_slots), is_new_user=json.dumps(is_new_user_check), today=date.today().isoformat())
+    booked_slots = db.session.execute(
+        select(Booking.booking_time).where(
+            Booking.game_id == game_id,
+            Booking.booking_time >= now,
+            Booking.status == 'Confirmed'
+        )
+    ).scalars().all()
+    is_new_user_check = not user_has_booking(current_user.id)
+
+    return render_template('book_game.html', game=game, booked_slots_json=orjson.dumps(booked_slots).decode(), is_new_user=orjson.dumps(is_new_user_check).decode(), today=date.today().isoformat())
 
 # --- MODIFIED ROUTE ---
 @app.route('/cancel_booking/<int:booking_id>', methods=['POST'])
@@ -343,7 +598,14 @@ def cancel_booking(booking_id):
     return redirect(request.referrer or url_for('profile')) # Redirect to the page they came from, or profile as a fallback
 
 # --- Auth Routes ---
+def _login_rate_key():
+    # Key on username as well as IP so one client cannot farm OTP sends
+    # for a victim address from rotating addresses, nor lock others out
+    # from behind a shared NAT
+    return (request.form.get('username') or '').lower().strip() + '|' + get_remote_address()
+
 @app.route('/login', methods=['GET', 'POST'])
+@limiter.limit("5 per minute;20 per hour", key_func=_login_rate_key, methods=['POST'])
 def login():
     if current_user.is_authenticated: return redirect(url_for('home'))
     if request.method == 'POST':
@@ -356,30 +618,29 @@ def login():
         if not user:
             user = User(username=username, role='student', id=uuid.uuid4())
             db.session.add(user)
+            db.session.commit()
             flash('Welcome! Creating your account.', 'success')
+        # The OTP lives in the cache with a 5-minute TTL — no profile-row
+        # write on login, and expiry is handled by the cache itself
         otp = secrets.token_hex(3).upper()
-        user.otp_hash = generate_password_hash(otp)
-        user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
-        db.session.commit()
-        if send_otp_email(user.username, otp):
-            session['username_for_verification'] = user.username
-            flash('An OTP has been sent to your email.', 'info')
-            return redirect(url_for('verify_otp'))
-        else:
-            flash('Failed to send OTP email. Please try again.', 'danger')
+        cache.set(f'otp:{username}', hash_otp(otp), timeout=300)
+        send_otp_task.delay(user.username, otp)
+        session['username_for_verification'] = user.username
+        flash('An OTP has been sent to your email.', 'info')
+        return redirect(url_for('verify_otp'))
     return render_template('login.html')
 
 @app.route('/verify_otp', methods=['GET', 'POST'])
+@limiter.limit("5 per minute", methods=['POST'])
 def verify_otp():
     username = session.get('username_for_verification')
     if not username: return redirect(url_for('login'))
     if request.method == 'POST':
         otp = request.form.get('otp').strip()
+        stored_hash = cache.get(f'otp:{username}')
         user = User.query.filter_by(username=username).first()
-        if user and user.otp_hash and user.otp_expiry > datetime.now(timezone.utc) and check_password_hash(user.otp_hash, otp):
-            user.otp_hash = None
-            user.otp_expiry = None
-            db.session.commit()
+        if user and stored_hash and hmac.compare_digest(stored_hash, hash_otp(otp)):
+            cache.delete(f'otp:{username}')
             login_user(user, remember=True)
             session.pop('username_for_verification', None)
             return redirect(url_for('home'))
@@ -402,14 +663,35 @@ def logout():
 @app.route('/profile')
 @login_required
 def profile():
-    bookings = Booking.query.filter_by(user_id=current_user.id).order_by(Booking.booking_time.desc()).all()
+    fingerprint = db.session.execute(
+        select(
+            func.max(Booking.id),
+            func.count(Booking.id),
+            func.count(Booking.id).filter(Booking.status == 'Confirmed')
+        ).where(Booking.user_id == current_user.id)
+    ).one()
+    etag = hashlib.md5(
+        f"profile:{current_user.id}:{current_user.wants_cancellation_notifications}:{fingerprint}".encode()
+    ).hexdigest()
+    return conditional_response(etag, render_profile)
+
+def render_profile():
+    # The template reads booking.game.name per card; eager-load so that is
+    # one IN query instead of a lazy SELECT per booking
+    bookings = Booking.query\
+        .options(selectinload(Booking.game))\
+        .filter_by(user_id=current_user.id)\
+        .order_by(Booking.booking_time.desc())\
+        .all()
+    # The page already holds every booking, so count in Python instead of
+    # issuing a second COUNT query
     stats = {
-        'user_bookings': Booking.query.filter_by(user_id=current_user.id, status='Confirmed').count()
+        'user_bookings': sum(1 for b in bookings if b.status == 'Confirmed')
     }
     # Pass the full 'user' object to the template, which now includes the notification preference
-    return render_template('profile.html', 
-                          bookings=bookings, 
-                          stats=stats, 
+    return render_template('profile.html',
+                          bookings=bookings,
+                          stats=stats,
                           user=current_user)
 
 # --- NEW ROUTE ---
@@ -435,12 +717,15 @@ def update_notification_preference():
 
 # --- Admin Routes ---
 @app.route('/admin/login', methods=['GET', 'POST'])
+@limiter.limit("5 per minute", methods=['POST'])
 def admin_login():
     if session.get('admin_logged_in'):
         return redirect(url_for('admin_dashboard'))
     if request.method == 'POST':
-        password = request.form.get('password')
-        if password == app.config['ADMIN_PASSWORD']:
+        password = request.form.get('password') or ''
+        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        expected = app.config['ADMIN_PASSWORD_HASH']
+        if expected and hmac.compare_digest(password_hash, expected):
             session['admin_logged_in'] = True
             return redirect(url_for('admin_dashboard'))
         else:
@@ -451,15 +736,29 @@ def admin_login():
 def admin_dashboard():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
-    users = User.query.order_by(User.username).all()
-    bookings = db.session.query(Booking, User, Game)\
-        .join(User, Booking.user_id == User.id)\
-        .join(Game, Booking.game_id == Game.id)\
+    # The template only renders username/role, so skip ORM hydration
+    users = db.session.execute(
+        select(User.username, User.role).order_by(User.username)
+    ).all()
+    # Paginate instead of hydrating every booking ever made; the stats
+    # cards get their counts from one aggregate query so they still
+    # cover the whole table, not just the current page.
+    page = request.args.get('page', 1, type=int)
+    bookings = Booking.query\
+        .options(selectinload(Booking.user), selectinload(Booking.game))\
         .order_by(Booking.booking_time.desc())\
-        .all()
-    return render_template('admin_dashboard.html', 
-                          users=users, 
-                          bookings=bookings)
+        .paginate(page=page, per_page=50, error_out=False)
+    confirmed_count, cancelled_count = db.session.execute(
+        select(
+            func.count(Booking.id).filter(Booking.status == 'Confirmed'),
+            func.count(Booking.id).filter(Booking.status == 'Cancelled')
+        )
+    ).one()
+    return render_template('admin_dashboard.html',
+                          users=users,
+                          bookings=bookings,
+                          confirmed_count=confirmed_count,
+                          cancelled_count=cancelled_count)
 
 @app.route('/admin/logout', methods=['POST'])
 def admin_logout():
@@ -471,33 +770,81 @@ def admin_logout():
 def download_report():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    p.drawString(inch, height - inch, "Sports Room Booking Report")
-    p.drawString(inch, height - inch - 20, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    y = height - inch * 2
-    bookings = db.session.query(Booking, User, Game)\
-        .join(User, Booking.user_id == User.id)\
-        .join(Game, Booking.game_id == Game.id)\
-        .order_by(Booking.booking_time.desc())\
-        .all()
-    ist_tz = pytz.timezone('Asia/Kolkata')
-    for booking, user, game in bookings:
-        booking_dt_ist = booking.booking_time.astimezone(ist_tz)
-        date_str = booking_dt_ist.strftime('%Y-%m-%d %I:%M %p')
-        text = f"- {user.username} booked {game.name} for {date_str} (Status: {booking.status})"
-        p.drawString(inch, y, text)
-        y -= 15
-        if y < inch:
-            p.showPage()
-            y = height - inch
-    p.save()
-    buffer.seek(0)
+
+    pdf_headers = {'Content-Disposition': 'attachment;filename=admin_report.pdf'}
+
+    # If nothing changed since the last download, serve the cached PDF
+    # instead of re-rendering. The fingerprint covers inserts (max id,
+    # count) and cancellations (confirmed count).
+    max_id, total, confirmed = db.session.execute(
+        select(
+            func.max(Booking.id),
+            func.count(Booking.id),
+            func.count(Booking.id).filter(Booking.status == 'Confirmed')
+        )
+    ).one()
+    report_key = f'report:{max_id}:{total}:{confirmed}'
+    cached_pdf = cache.get(report_key)
+    if cached_pdf is not None:
+        return Response(cached_pdf, mimetype='application/pdf', headers=pdf_headers)
+
+    def generate():
+        chunks = []
+        tee_bytes = 0
+        # SpooledTemporaryFile spills to disk past 1MB, so peak RAM stays
+        # flat however many bookings the report covers.
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as buffer:
+            p = canvas.Canvas(buffer, pagesize=letter)
+            width, height = letter
+            p.drawString(inch, height - inch, "Sports Room Booking Report")
+            p.drawString(inch, height - inch - 20, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            y = height - inch * 2
+            # Plain Row tuples: the report only needs four columns, so skip
+            # constructing full ORM instances for every booking
+            bookings = db.session.execute(
+                select(Booking.booking_time, Booking.status, User.username, Game.name)
+                .join(User, Booking.user_id == User.id)
+                .join(Game, Booking.game_id == Game.id)
+                .order_by(Booking.booking_time.desc())
+                # stream_results makes psycopg2 use a named server-side
+                # cursor, so rows arrive in 500-row batches instead of the
+                # whole result set being buffered client-side first
+                .execution_options(yield_per=500, stream_results=True)
+            )
+            # India has no DST, so the UTC offset is a constant +05:30;
+            # adding it directly skips pytz's per-row tz arithmetic.
+            ist_offset = timedelta(hours=5, minutes=30)
+            for booking_time, status, username, game_name in bookings:
+                date_str = (booking_time + ist_offset).strftime('%Y-%m-%d %I:%M %p')
+                text = f"- {username} booked {game_name} for {date_str} (Status: {status})"
+                p.drawString(inch, y, text)
+                y -= 15
+                if y < inch:
+                    p.showPage()
+                    y = height - inch
+            p.save()
+            buffer.seek(0)
+            while True:
+                chunk = buffer.read(8192)
+                if not chunk:
+                    break
+                # Tee a copy for repeat downloads, but stop collecting the
+                # moment it outgrows the cache cap so accumulation stays
+                # bounded by the cap, not by the size of the PDF.
+                if chunks is not None:
+                    tee_bytes += len(chunk)
+                    if tee_bytes > 2 * 1024 * 1024:
+                        chunks = None
+                    else:
+                        chunks.append(chunk)
+                yield chunk
+        if chunks is not None:
+            cache.set(report_key, b''.join(chunks), timeout=3600)
+
     return Response(
-        buffer,
+        stream_with_context(generate()),
         mimetype='application/pdf',
-        headers={'Content-Disposition': 'attachment;filename=admin_report.pdf'}
+        headers=pdf_headers
     )
 
 
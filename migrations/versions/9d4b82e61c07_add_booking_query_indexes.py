@@ -0,0 +1,30 @@
+"""Add booking query indexes
+
+Revision ID: 9d4b82e61c07
+Revises: a2c5e09b7d31
+Create Date: 2026-08-26 12:18:27.664209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4b82e61c07'
+down_revision = 'a2c5e09b7d31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index('ix_booking_time_status', ['booking_time', 'status'], unique=False)
+        batch_op.create_index('ix_booking_user_status', ['user_id', 'status'], unique=False)
+        batch_op.create_index('ix_booking_user_time', ['user_id', 'booking_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_user_time')
+        batch_op.drop_index('ix_booking_user_status')
+        batch_op.drop_index('ix_booking_time_status')
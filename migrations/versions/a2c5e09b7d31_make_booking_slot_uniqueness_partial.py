@@ -0,0 +1,29 @@
+"""Make booking slot uniqueness partial on Confirmed status
+
+Revision ID: a2c5e09b7d31
+Revises: f59b3a6d812c
+Create Date: 2026-08-26 11:47:03.552941
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2c5e09b7d31'
+down_revision = 'f59b3a6d812c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # No-op. This revision originally converted uq_booking_slot from a
+    # full unique constraint to the partial-on-Confirmed index, but the
+    # full constraint could never be applied to databases where a
+    # cancelled slot had been rebooked, so c41d9f27ab5e now creates the
+    # partial index directly. Kept to preserve the revision chain.
+    pass
+
+
+def downgrade():
+    pass
@@ -0,0 +1,31 @@
+"""Add booking slot index and unique constraint
+
+Revision ID: c41d9f27ab5e
+Revises: 16a6d3d4e83e
+Create Date: 2026-08-26 10:02:11.418306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d9f27ab5e'
+down_revision = '16a6d3d4e83e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_booking_game_time', 'booking', ['game_id', 'booking_time'], unique=False)
+    # Partial from the start: the app has always allowed a cancelled slot
+    # to be rebooked, so real data can hold a Cancelled and a Confirmed
+    # row for the same (game_id, booking_time). A full unique constraint
+    # would abort the upgrade on such data; only Confirmed rows contend.
+    op.create_index('uq_booking_slot', 'booking', ['game_id', 'booking_time'],
+                    unique=True, postgresql_where=sa.text("status = 'Confirmed'"))
+
+
+def downgrade():
+    op.drop_index('uq_booking_slot', table_name='booking')
+    op.drop_index('ix_booking_game_time', table_name='booking')
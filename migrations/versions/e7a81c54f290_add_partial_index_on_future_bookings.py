@@ -0,0 +1,30 @@
+"""Add partial index on future bookings
+
+Revision ID: e7a81c54f290
+Revises: c41d9f27ab5e
+Create Date: 2026-08-26 10:41:52.907114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a81c54f290'
+down_revision = 'c41d9f27ab5e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Index predicates must be immutable, so the cutoff is a literal taken
+    # at migration time; the rebuild_future_booking_index Celery beat task
+    # re-creates the index nightly with a fresh cutoff.
+    op.execute(
+        "CREATE INDEX ix_booking_future ON booking (game_id, booking_time) "
+        "WHERE booking_time >= '2026-08-25 00:00:00+00'"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_booking_future', table_name='booking')
@@ -0,0 +1,30 @@
+"""Drop OTP columns from profiles
+
+Revision ID: f59b3a6d812c
+Revises: e7a81c54f290
+Create Date: 2026-08-26 11:28:45.120583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f59b3a6d812c'
+down_revision = 'e7a81c54f290'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # OTPs now live in the cache with a TTL instead of the profiles table
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        batch_op.drop_column('otp_expiry')
+        batch_op.drop_column('otp_hash')
+
+
+def downgrade():
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('otp_hash', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('otp_expiry', postgresql.TIMESTAMP(timezone=True), nullable=True))
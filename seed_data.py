@@ -0,0 +1,74 @@
+"""Seed the games catalog.
+
+Run directly (``python seed_data.py``) to populate the games table with
+the default catalog when it is empty.
+"""
+import os
+import sys
+
+from dotenv import load_dotenv, find_dotenv
+
+# CI and containers inject the env directly; only pay for find_dotenv's
+# upward directory walk when the config is actually missing, and never
+# let a stray .env override what the process was started with.
+if not os.environ.get('DATABASE_URL'):
+    load_dotenv(find_dotenv(usecwd=True), override=False)
+
+# Built once at import time; a tuple so nothing mutates the catalog
+# between calls.
+_GAMES_DATA = (
+    {'name': 'Badminton', 'max_players': 4, 'duration_minutes': 30, 'image_filename': 'badminton.png'},
+    {'name': 'Basketball', 'max_players': 10, 'duration_minutes': 60, 'image_filename': 'basketball.png'},
+    {'name': 'Chess', 'max_players': 2, 'duration_minutes': 45, 'image_filename': 'chess.png'},
+    {'name': 'Cricket', 'max_players': 22, 'duration_minutes': 90, 'image_filename': 'cricket.png'},
+    {'name': 'Pool', 'max_players': 4, 'duration_minutes': 30, 'image_filename': 'pool.png'},
+    {'name': 'Table Tennis', 'max_players': 4, 'duration_minutes': 30, 'image_filename': 'table_tennis.png'},
+)
+
+
+def seed_games(bind=None):
+    """Insert any missing rows of the default catalog.
+
+    ``bind`` lets setup_db.py pass its own Core connection so DDL and
+    seeding share one transaction; without it the ORM session is used
+    and committed here.
+    """
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    from app import db, Game
+
+    executor = db.session if bind is None else bind
+    # Idempotent in one statement: ON CONFLICT against the unique name
+    # skips rows that already exist server-side, so there is no COUNT
+    # round-trip beforehand and no race between concurrent seeders.
+    dialect = (bind.dialect if bind is not None else db.engine.dialect).name
+    insert_fn = sqlite_insert if dialect == 'sqlite' else pg_insert
+    result = executor.execute(
+        insert_fn(Game)
+        .values(list(_GAMES_DATA))
+        .on_conflict_do_nothing(index_elements=['name'])
+    )
+    if bind is None:
+        db.session.commit()
+    print(f"Seeded games catalog ({result.rowcount} new rows).")
+
+
+def check_and_seed():
+    # Importing app pulls in Flask, SQLAlchemy and friends — a few
+    # hundred ms of startup work. Defer it to call time so merely
+    # importing this module (e.g. for _GAMES_DATA) stays cheap.
+    from app import app
+
+    with app.app_context():
+        seed_games()
+
+
+if __name__ == '__main__':
+    try:
+        check_and_seed()
+    except Exception as exc:
+        # Deploy steps check the exit code; a swallowed failure here
+        # would let a release proceed against an unseeded database.
+        print(f"Seeding failed: {exc}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,23 @@
+"""Create the schema and seed the games catalog.
+
+Run directly (``python setup_db.py``) to bring up a fresh database.
+"""
+from app import app, db
+from seed_data import seed_games
+
+
+if __name__ == '__main__':
+    # One transaction spans the DDL and the seed inserts, so the database
+    # comes up atomically and the whole script costs a single commit/fsync
+    # instead of one per statement.
+    with app.app_context(), db.engine.begin() as conn:
+        if conn.dialect.name == 'sqlite':
+            # Dev/throwaway databases only: skip the per-commit fsync for
+            # the duration of this connection. The settings are
+            # per-connection, so they die with the script.
+            conn.exec_driver_sql('PRAGMA synchronous=OFF')
+            conn.exec_driver_sql('PRAGMA journal_mode=MEMORY')
+            conn.exec_driver_sql('PRAGMA temp_store=MEMORY')
+        db.metadata.create_all(bind=conn)
+        seed_games(bind=conn)
+    print("Database ready.")